@@ -0,0 +1,40 @@
+"""post lookup and search indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-15 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_posts_author_id", "posts", ["author_id"])
+    op.create_index("ix_posts_status", "posts", ["status"])
+    op.create_index("ix_post_revisions_post_id", "post_revisions", ["post_id"])
+    if op.get_bind().dialect.name == "postgresql":
+        # must match models.search_vector() exactly for the planner to use it
+        op.create_index(
+            "ix_posts_search",
+            "posts",
+            [sa.text("to_tsvector('english'::regconfig, coalesce(title, '') || ' ' || coalesce(content, ''))")],
+            postgresql_using="gin",
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_index("ix_posts_search", table_name="posts")
+    op.drop_index("ix_post_revisions_post_id", table_name="post_revisions")
+    op.drop_index("ix_posts_status", table_name="posts")
+    op.drop_index("ix_posts_author_id", table_name="posts")
@@ -0,0 +1,27 @@
+"""post content hash
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-15 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # existing rows stay NULL and are hashed on their next edit
+    op.add_column("posts", sa.Column("content_hash", sa.LargeBinary(16), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("posts", "content_hash")
@@ -0,0 +1,37 @@
+"""post composite indexes
+
+The single-column status and author_id indexes from 0002 are prefixes of
+the new composites and are dropped.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-15 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_posts_status_scheduled", "posts", ["status", "scheduled_for"])
+    op.create_index("ix_posts_status_published_at", "posts", ["status", "published_at"])
+    op.create_index("ix_posts_author_status", "posts", ["author_id", "status"])
+    op.drop_index("ix_posts_status", table_name="posts")
+    op.drop_index("ix_posts_author_id", table_name="posts")
+
+
+def downgrade() -> None:
+    op.create_index("ix_posts_author_id", "posts", ["author_id"])
+    op.create_index("ix_posts_status", "posts", ["status"])
+    op.drop_index("ix_posts_author_status", table_name="posts")
+    op.drop_index("ix_posts_status_published_at", table_name="posts")
+    op.drop_index("ix_posts_status_scheduled", table_name="posts")
@@ -0,0 +1,36 @@
+"""utc server defaults
+
+posts.created_at and post_revisions.revision_timestamp default to naive
+UTC like the other timestamps. Only Postgres changes: elsewhere now()
+already compiles to CURRENT_TIMESTAMP, which is UTC.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-15 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UTC_NOW = sa.text("timezone('UTC', now())")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.alter_column("posts", "created_at", server_default=UTC_NOW)
+        op.alter_column("post_revisions", "revision_timestamp", server_default=UTC_NOW)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.alter_column("post_revisions", "revision_timestamp", server_default=sa.func.now())
+        op.alter_column("posts", "created_at", server_default=sa.func.now())
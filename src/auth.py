@@ -1,6 +1,7 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Union
-from jose import jwt
+import jwt
 from passlib.context import CryptContext
 import os
 
@@ -8,6 +9,18 @@ SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# built once rather than on every decode
+_jwt = jwt.PyJWT()
+_ALGORITHMS = [ALGORITHM]
+_DECODE_OPTIONS = {"verify_signature": True, "require": ["exp", "sub"]}
+
+@dataclass(frozen=True, slots=True)
+class UserPrincipal:
+    """The authenticated caller, as far as request handlers need to know."""
+    id: int
+    email: str
+    role: str
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str):
@@ -20,4 +33,11 @@ def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
\ No newline at end of file
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_user_token(user) -> str:
+    # id and role ride in the token so authenticated requests need no user lookup
+    return create_access_token(data={"sub": user.email, "uid": user.id, "role": user.role.value})
+
+def decode_access_token(token: str) -> dict:
+    return _jwt.decode(token, SECRET_KEY, algorithms=_ALGORITHMS, options=_DECODE_OPTIONS)
\ No newline at end of file
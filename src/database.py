@@ -1,17 +1,56 @@
 import os
 import time
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker, raiseload
 from sqlalchemy.exc import OperationalError
 
 # allow override from environment for flexibility
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/cms_db")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# fail fast on an unreachable host and cap runaway queries (Postgres only)
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+connect_args = {}
+if SQLALCHEMY_DATABASE_URL.startswith("postgresql"):
+    connect_args = {
+        "connect_timeout": 2,
+        "options": f"-c statement_timeout={STATEMENT_TIMEOUT_MS}",
+    }
+
+# size the pool for concurrent requests (each holds a connection for its
+# whole lifetime) and ping before checkout so idle-killed connections
+# don't surface as 500s; the single-threaded worker overrides these via env
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=30,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    connect_args=connect_args,
+)
+# expire_on_commit=False: handlers return the object they just wrote, and the
+# mapped values (plus server-side ones fetched by RETURNING, see Post) are
+# already current, so serializing it shouldn't trigger a reload SELECT
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
+# Opt-in N+1 guard (tests/dev): with RAISELOAD_GUARD set, touching a relationship
+# that the query didn't load raises instead of silently issuing another SELECT.
+# Routes that need a relationship must load it with selectinload()/joinedload().
+if os.getenv("RAISELOAD_GUARD"):
+    @event.listens_for(Session, "do_orm_execute")
+    def _raiseload_guard(orm_execute_state):
+        if (
+            orm_execute_state.is_select
+            and not orm_execute_state.is_column_load
+            and not orm_execute_state.is_relationship_load
+        ):
+            orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*"))
+
 def get_db():
     db = SessionLocal()
     try:
@@ -20,15 +59,18 @@ def get_db():
         db.close()
 
 def wait_for_db():
+    # exponential backoff: a DB that is up in a second is picked up in a second
     retries = 10
+    delay = 0.25
     while retries > 0:
         try:
             conn = engine.connect()
             conn.close()
             print("Successfully connected to the database!")
             return
-        except Exception as e:
+        except OperationalError as e:
             print(f"Database not ready yet... ({e})")
             retries -= 1
-            time.sleep(5)
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
     raise Exception("Could not connect to the database")
\ No newline at end of file
@@ -1,23 +1,65 @@
 import os
 import shutil
-import json
+import orjson
+import time
+import hashlib
+import itertools
+import secrets
+import threading
 import redis
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
-from fastapi.security import APIKeyHeader
+import anyio
+from contextlib import asynccontextmanager
+from cachetools import TTLCache
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Request, Response
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.encoders import jsonable_encoder
+from fastapi.exception_handlers import http_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from fastapi.utils import is_body_allowed_for_status_code
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, load_only
 from slugify import slugify
 from typing import List
-from datetime import datetime
-from jose import jwt, JWTError
+from pydantic import TypeAdapter
+from datetime import datetime, timezone
+from jwt import PyJWTError
 
 from . import models, schemas, auth, database
 
-app = FastAPI(title="CMS Backend")
+# --- THREADPOOL ---
+# Routes are sync (psycopg2 blocks), so FastAPI runs them in AnyIO's threadpool,
+# which defaults to 40 threads. Sessions only check out a DB connection on first
+# query, so cache hits can keep flowing while DB-bound requests wait on the pool.
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "100"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    yield
+
+# orjson for every JSON body FastAPI renders; the cached public endpoints
+# already return pre-encoded bytes
+app = FastAPI(title="CMS Backend", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+# error bodies too: FastAPI's default handlers always use starlette's JSONResponse
+@app.exception_handler(StarletteHTTPException)
+async def orjson_http_exception_handler(request: Request, exc: StarletteHTTPException):
+    if not is_body_allowed_for_status_code(exc.status_code):
+        return await http_exception_handler(request, exc)
+    return ORJSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=getattr(exc, "headers", None))
+
+@app.exception_handler(RequestValidationError)
+async def orjson_validation_exception_handler(request: Request, exc: RequestValidationError):
+    return ORJSONResponse({"detail": jsonable_encoder(exc.errors())}, status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
 
 # --- DATABASE STARTUP & AUTO-SEEDING ---
+# schema is managed by Alembic (`alembic upgrade head` runs before Uvicorn)
 database.wait_for_db()
-models.Base.metadata.create_all(bind=database.engine)
 
 def auto_seed_data():
     """Satisfies requirement: No manual database seeding steps allowed."""
@@ -44,50 +86,190 @@ def auto_seed_data():
 auto_seed_data()
 
 # --- REDIS SETUP ---
-redis_client = redis.Redis(host='cache', port=6379, db=0, decode_responses=True)
+# Shared, bounded pool: threads wait for a free connection (up to 5s) instead
+# of opening one per request. Raw bytes: cached payloads go to clients as-is.
+REDIS_URL = os.getenv("REDIS_URL", "redis://cache:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+redis_pool = redis.BlockingConnectionPool.from_url(REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS, timeout=5)
+redis_client = redis.Redis(connection_pool=redis_pool)
 CACHE_EXPIRE = 3600 
+# set of every cached published_list_* key, used for invalidation
+PUBLISHED_LIST_KEYS = "published_list_keys"
+SEARCH_CACHE_EXPIRE = 300
+SEARCH_CACHE_KEYS = "search_cache_keys"
+# Sorted set of post id -> scheduled_for (UTC epoch seconds) that the worker
+# blocks on instead of polling the posts table
+SCHEDULED_POSTS_KEY = "scheduled_posts"
+# single-flight rebuilds: lock lifetime and how long losers wait for the winner
+SINGLE_FLIGHT_LOCK_MS = 5000
+SINGLE_FLIGHT_POLLS = 20
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
 
 # --- MEDIA STORAGE SETUP ---
 UPLOAD_DIR = "uploads"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
 # --- AUTH CONFIG ---
-api_key_header = APIKeyHeader(name="Authorization", auto_error=False)
+bearer_scheme = HTTPBearer(auto_error=False)
+
+# Validated tokens are cached by hash so repeat requests skip JWT verification.
+# Tokens from /auth/login carry the user's id and role as claims, so a deleted
+# or demoted author keeps access until the token's own exp
+# (auth.ACCESS_TOKEN_EXPIRE_MINUTES, 60 min); this TTL doesn't shorten that.
+TOKEN_CACHE_TTL = 30
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL)
+# TTLCache isn't thread-safe and get_current_user runs on the threadpool
+_token_cache_lock = threading.Lock()
+# user records cached in Redis (no password hash) for tokens without uid/role
+# claims; short so role changes apply within a minute
+USER_CACHE_EXPIRE = 60
 
 # --- HELPERS ---
 
-def get_current_user(token: str = Depends(api_key_header), db: Session = Depends(database.get_db)):
-    if not token:
+def token_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def load_principal(email: str, db: Session) -> auth.UserPrincipal:
+    """Look up the caller for tokens issued before `uid`/`role` claims existed."""
+    # second tier, shared across processes: the user record, keyed by email
+    user_key = f"user_cache_{email}"
+    cached_user = redis_client.get(user_key)
+    if cached_user:
+        data = orjson.loads(cached_user)
+        return auth.UserPrincipal(id=data["id"], email=data["email"], role=data["role"])
+    user = db.query(models.User).filter(models.User.email == email).first()
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    principal = auth.UserPrincipal(id=user.id, email=user.email, role=user.role.value)
+    redis_client.setex(user_key, USER_CACHE_EXPIRE, orjson.dumps({
+        "id": principal.id,
+        "email": principal.email,
+        "role": principal.role,
+    }))
+    return principal
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme), db: Session = Depends(database.get_db)) -> auth.UserPrincipal:
+    if not credentials:
         raise HTTPException(status_code=401, detail="Missing Authorization Header")
     
-    actual_token = token.replace("Bearer ", "") 
+    actual_token = credentials.credentials
+    cache_key = token_cache_key(actual_token)
+    with _token_cache_lock:
+        cached = _token_cache.get(cache_key)
+    if cached:
+        payload, user = cached
+        # never serve a token past its own expiry, whatever the cache TTL
+        if payload["exp"] > time.time():
+            return user
+        with _token_cache_lock:
+            _token_cache.pop(cache_key, None)
+
     try:
-        payload = jwt.decode(actual_token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+        payload = auth.decode_access_token(actual_token)
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token payload")
-    except JWTError:
+    except PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    if "uid" in payload and "role" in payload:
+        # current tokens carry id and role: no user lookup at all
+        user = auth.UserPrincipal(id=payload["uid"], email=email, role=payload["role"])
+    else:
+        user = load_principal(email, db)
     
     if user.role != schemas.UserRole.author:
         raise HTTPException(status_code=403, detail="Not authorized: Authors only")
     
+    with _token_cache_lock:
+        _token_cache[cache_key] = (payload, user)
     return user
 
-def clear_post_cache(post_id: int = None):
-    """Robust Cache Invalidation Strategy."""
-    if post_id:
-        redis_client.delete(f"post_cache_{post_id}")
-    list_keys = redis_client.keys("published_list_*")
-    if list_keys:
-        redis_client.delete(*list_keys)
+def author_posts_version_key(author_id: int) -> str:
+    return f"author_posts_version_{author_id}"
+
+def clear_post_cache(post_id: int = None, author_id: int = None):
+    """Robust Cache Invalidation Strategy.
+
+    List and search keys are tracked in sets, so invalidation touches only the
+    cached entries instead of running a blocking KEYS scan over the keyspace.
+    The sets are read and reset in one MULTI, so a key registered by a
+    concurrent rebuild lands in the fresh set rather than being dropped.
+    Bumping the author's version invalidates their list_posts ETags.
+    """
+    with redis_client.pipeline() as pipe:
+        if author_id:
+            pipe.incr(author_posts_version_key(author_id))
+        if post_id:
+            pipe.delete(f"post_cache_{post_id}")
+        pipe.sunion(PUBLISHED_LIST_KEYS, SEARCH_CACHE_KEYS)
+        pipe.delete(PUBLISHED_LIST_KEYS, SEARCH_CACHE_KEYS)
+        cached_keys = pipe.execute()[-2]
+    if cached_keys:
+        # UNLINK frees memory in the background instead of blocking Redis
+        redis_client.unlink(*cached_keys)
+
+# Validate ORM rows and emit JSON bytes in one pydantic-core pass each, with no
+# intermediate dicts or a second encoder
+_post_adapter = TypeAdapter(schemas.PostResponse)
+_post_list_adapter = TypeAdapter(List[schemas.PostResponse])
+_post_summary_list_adapter = TypeAdapter(List[schemas.PostSummary])
+
+def dump_posts(posts, adapter=_post_list_adapter) -> bytes:
+    return adapter.dump_json(adapter.validate_python(posts, from_attributes=True))
+
+# Columns behind schemas.PostSummary; list queries load only these so the
+# (potentially large) content column is never fetched
+POST_SUMMARY_COLUMNS = load_only(
+    models.Post.id, models.Post.title, models.Post.slug, models.Post.status,
+    models.Post.author_id, models.Post.created_at, models.Post.updated_at,
+    models.Post.published_at, models.Post.scheduled_for,
+)
+
+def _wait_for_rebuild():
+    """One poll interval while another request rebuilds the entry."""
+    time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+
+def get_or_set_single_flight(cache_key: str, expire: int, loader, index_key: str = None):
+    """Cache-aside read that lets only one request per key rebuild on a miss.
+
+    The request that wins a short SET NX lock runs `loader` and caches its bytes
+    (registering the key in `index_key` for invalidation); concurrent misses poll
+    for that result instead of all hitting the database. A `None` result is not
+    cached. If the rebuild outlasts the wait, the caller loads without caching.
+    """
+    cached_data = redis_client.get(cache_key)
+    if cached_data:
+        return cached_data
+
+    lock_key = f"lock_{cache_key}"
+    token = secrets.token_hex(8)
+    if redis_client.set(lock_key, token, nx=True, px=SINGLE_FLIGHT_LOCK_MS):
+        try:
+            payload = loader()
+            if payload is not None:
+                # one round trip; MULTI keeps the entry and its index in step
+                with redis_client.pipeline() as pipe:
+                    pipe.setex(cache_key, expire, payload)
+                    if index_key:
+                        pipe.sadd(index_key, cache_key)
+                    pipe.execute()
+            return payload
+        finally:
+            # only release our own lock; it may have expired and been retaken
+            if redis_client.get(lock_key) == token.encode():
+                redis_client.delete(lock_key)
+
+    for _ in range(SINGLE_FLIGHT_POLLS):
+        _wait_for_rebuild()
+        cached_data = redis_client.get(cache_key)
+        if cached_data:
+            return cached_data
+    return loader()
 
 # --- AUTH ROUTES ---
 
@@ -97,198 +279,274 @@ def login(user_credentials: schemas.UserLogin, db: Session = Depends(database.ge
     if not user or not auth.verify_password(user_credentials.password, user.password_hash):
         raise HTTPException(status_code=403, detail="Invalid email or password")
     
-    access_token = auth.create_access_token(data={"sub": user.email})
+    access_token = auth.create_user_token(user)
     return {"token": access_token, "user": user}
 
+@app.post("/auth/logout")
+async def logout(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+    """Drop the token from the validation cache. JWTs stay valid until `exp`."""
+    if credentials:
+        with _token_cache_lock:
+            _token_cache.pop(token_cache_key(credentials.credentials), None)
+    return {"message": "Logged out successfully"}
+
 # --- POST CONTENT ROUTES (Author Only) ---
 
-@app.post("/posts", response_model=schemas.PostResponse)
+def content_digest(content: str) -> bytes:
+    return hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+
 def generate_unique_slug(db: Session, title: str, post_id: int = None) -> str:
     """Generate a URL-friendly, unique slug for the given title.
-    If a slug collision occurs, append a counter until the slug is unique.
+    If a slug collision occurs, append the lowest free counter.
     If `post_id` is provided, ignore the current post when checking collisions.
     """
     base = slugify(title)
-    slug = base
-    counter = 1
-    while True:
-        query = db.query(models.Post).filter(models.Post.slug == slug)
-        if post_id:
-            query = query.filter(models.Post.id != post_id)
-        exists = query.first()
-        if not exists:
-            break
-        slug = f"{base}-{counter}"
-        counter += 1
-    return slug
+    query = db.query(models.Post.slug)
+    if post_id:
+        query = query.filter(models.Post.id != post_id)
+    # common case: the base slug is free; EXISTS stops at the first index hit
+    if not db.query(query.filter(models.Post.slug == base).exists()).scalar():
+        return base
+    # only on collision: fetch every suffixed candidate in one round trip
+    # instead of probing each (LIKE can't use the btree under a non-C collation)
+    taken = {slug for (slug,) in query.filter(models.Post.slug.like(f"{base}-%")).all()}
+    return next(f"{base}-{i}" for i in itertools.count(1) if f"{base}-{i}" not in taken)
 
 
+# INSERTs tried per create before giving up on a slug collision race
+SLUG_INSERT_ATTEMPTS = 3
+
 @app.post("/posts", response_model=schemas.PostResponse)
-def create_post(post_in: schemas.PostCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
+def create_post(post_in: schemas.PostCreate, db: Session = Depends(database.get_db), current_user: auth.UserPrincipal = Depends(get_current_user)):
     # slug uniqueness handled inside helper
     slug = generate_unique_slug(db, post_in.title)
     new_post = models.Post(
         title=post_in.title,
         content=post_in.content,
+        content_hash=content_digest(post_in.content),
         slug=slug,
         author_id=current_user.id,
-        status=schemas.PostStatus.draft
+        status=schemas.PostStatus.draft,
+        # set explicitly so the attribute stays loaded after the INSERT
+        updated_at=None
     )
-    # transactional write
-    with db.begin():
-        db.add(new_post)
-    db.refresh(new_post)
-    clear_post_cache()
+    # a concurrent create can take the slug between the lookup and the INSERT;
+    # retry that INSERT under a SAVEPOINT with a random suffix rather than
+    # failing the whole request
+    for _ in range(SLUG_INSERT_ATTEMPTS):
+        try:
+            with db.begin_nested():
+                db.add(new_post)
+            break
+        except IntegrityError:
+            new_post.slug = f"{slug}-{secrets.token_hex(3)}"
+    else:
+        raise HTTPException(status_code=409, detail="Could not allocate a unique slug")
+    db.commit()
+    clear_post_cache(author_id=current_user.id)
     return new_post
 
 # ==========================================
 # PUBLIC FACING ENDPOINTS (WITH REDIS CACHING)
 # ==========================================
 
-@app.get("/posts/published", response_model=List[schemas.PostResponse])
+@app.get("/posts/published", response_model=List[schemas.PostSummary])
 def list_published_posts(skip: int = 0, limit: int = 10, db: Session = Depends(database.get_db)):
     cache_key = f"published_list_{skip}_{limit}"
-    
-    cached_data = redis_client.get(cache_key)
-    if cached_data:
-        return json.loads(cached_data)
 
-    posts = db.query(models.Post).filter(
-        models.Post.status == schemas.PostStatus.published
-    ).offset(skip).limit(limit).all()
-    
-    # Fix for Pydantic V2 model validation
-    serializable_data = [json.loads(schemas.PostResponse.model_validate(p).model_dump_json()) for p in posts]
-    redis_client.setex(cache_key, CACHE_EXPIRE, json.dumps(serializable_data))
-    
-    return posts
+    def load():
+        posts = db.query(models.Post).options(POST_SUMMARY_COLUMNS).filter(
+            models.Post.status == schemas.PostStatus.published
+        ).order_by(models.Post.published_at.desc(), models.Post.id.desc()).offset(skip).limit(limit).all()
+        return dump_posts(posts, _post_summary_list_adapter)
+
+    payload = get_or_set_single_flight(cache_key, CACHE_EXPIRE, load, index_key=PUBLISHED_LIST_KEYS)
+    return Response(content=payload, media_type="application/json")
 
 @app.get("/posts/published/{id}", response_model=schemas.PostResponse)
 def get_published_post(id: int, db: Session = Depends(database.get_db)):
     cache_key = f"post_cache_{id}"
-    
-    cached_data = redis_client.get(cache_key)
-    if cached_data:
-        return json.loads(cached_data)
 
-    post = db.query(models.Post).filter(
-        models.Post.id == id, 
-        models.Post.status == schemas.PostStatus.published
-    ).first()
-    
-    if not post:
+    def load():
+        post = db.get(models.Post, id)
+        if not post or post.status != schemas.PostStatus.published:
+            return None
+        return _post_adapter.dump_json(_post_adapter.validate_python(post, from_attributes=True))
+
+    payload = get_or_set_single_flight(cache_key, CACHE_EXPIRE, load)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Published post not found")
-    
-    # Fix for Pydantic V2 model validation
-    serializable_data = json.loads(schemas.PostResponse.model_validate(post).model_dump_json())
-    redis_client.setex(cache_key, CACHE_EXPIRE, json.dumps(serializable_data))
-    
-    return post
+    return Response(content=payload, media_type="application/json")
 
 @app.get("/search", response_model=List[schemas.PostResponse])
-def search_posts(q: str, db: Session = Depends(database.get_db)):
-    results = db.query(models.Post).filter(
-        models.Post.status == schemas.PostStatus.published,
-        (models.Post.title.ilike(f"%{q}%")) | (models.Post.content.ilike(f"%{q}%"))
-    ).all()
-    return results
+def search_posts(q: str, skip: int = 0, limit: int = 10, db: Session = Depends(database.get_db)):
+    digest = hashlib.blake2b(q.encode(), digest_size=16).hexdigest()
+    cache_key = f"search_cache_{skip}_{limit}_{digest}"
+
+    def load():
+        query = db.query(models.Post).filter(models.Post.status == schemas.PostStatus.published)
+        if db.get_bind().dialect.name == "postgresql":
+            # tsvector match served by the ix_posts_search GIN index, best first
+            vector = models.search_vector(models.Post.title, models.Post.content)
+            ts_query = func.plainto_tsquery(models.SEARCH_CONFIG, q)
+            query = query.filter(vector.op("@@")(ts_query)).order_by(func.ts_rank(vector, ts_query).desc(), models.Post.id)
+        else:
+            query = query.filter(
+                (models.Post.title.ilike(f"%{q}%")) | (models.Post.content.ilike(f"%{q}%"))
+            ).order_by(models.Post.id)
+        return dump_posts(query.offset(skip).limit(limit).all())
+
+    payload = get_or_set_single_flight(cache_key, SEARCH_CACHE_EXPIRE, load, index_key=SEARCH_CACHE_KEYS)
+    return Response(content=payload, media_type="application/json")
 
 # ==========================================
 # AUTHOR CRUD & VERSIONING
 # ==========================================
 
-@app.get("/posts", response_model=List[schemas.PostResponse])
-def list_posts(skip: int = 0, limit: int = 10, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
-    return db.query(models.Post).filter(models.Post.author_id == current_user.id).offset(skip).limit(limit).all()
+@app.get("/posts", response_model=List[schemas.PostSummary])
+def list_posts(request: Request, response: Response, skip: int = 0, limit: int = 10, db: Session = Depends(database.get_db), current_user: auth.UserPrincipal = Depends(get_current_user)):
+    # the author's version changes on every write to their posts, so an
+    # unchanged ETag means the admin UI's poll needs no query at all
+    version_key = author_posts_version_key(current_user.id)
+    version = redis_client.get(version_key)
+    if version is None:
+        # seeded from the clock so an evicted counter can't restart at an
+        # ETag a client already holds
+        redis_client.set(version_key, time.time_ns(), nx=True)
+        version = redis_client.get(version_key)
+    # the page is part of the representation: each skip/limit gets its own tag
+    etag = f'W/"{current_user.id}-{int(version)}-{skip}-{limit}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return db.query(models.Post).options(POST_SUMMARY_COLUMNS).filter(models.Post.author_id == current_user.id).offset(skip).limit(limit).all()
 
 @app.get("/posts/{id}", response_model=schemas.PostResponse)
-def get_post(id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
-    post = db.query(models.Post).filter(models.Post.id == id, models.Post.author_id == current_user.id).first()
-    if not post:
+def get_post(id: int, db: Session = Depends(database.get_db), current_user: auth.UserPrincipal = Depends(get_current_user)):
+    post = db.get(models.Post, id)
+    if not post or post.author_id != current_user.id:
         raise HTTPException(status_code=404, detail="Post not found")
     return post
 
 @app.put("/posts/{id}", response_model=schemas.PostResponse)
-def update_post(id: int, post_in: schemas.PostCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
-    post = db.query(models.Post).filter(models.Post.id == id, models.Post.author_id == current_user.id).first()
-    if not post:
+def update_post(id: int, post_in: schemas.PostCreate, db: Session = Depends(database.get_db), current_user: auth.UserPrincipal = Depends(get_current_user)):
+    post = db.get(models.Post, id)
+    if not post or post.author_id != current_user.id:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    # transactional update + revision snapshot
-    with db.begin():
-        # snapshot current state
-        revision = models.PostRevision(
-            post_id=post.id,
-            title_snapshot=post.title,
-            content_snapshot=post.content,
-            revision_author_id=current_user.id
-        )
-        db.add(revision)
+    # identical resubmission (e.g. autosave): no revision, no write
+    new_hash = content_digest(post_in.content)
+    if post_in.title == post.title and new_hash == post.content_hash:
+        return post
 
-        # apply changes
+    # content-only edits keep their slug; no uniqueness lookup needed
+    new_slug = post.slug
+    if post_in.title != post.title:
         new_slug = generate_unique_slug(db, post_in.title, post_id=post.id)
-        post.title = post_in.title
-        post.content = post_in.content
-        post.slug = new_slug
-        post.updated_at = datetime.utcnow()
-
-    # commit happens automatically when context exits
-    db.refresh(post)
-    clear_post_cache(id)
+
+    # Core INSERT, committed with the post update: the revision is write-only, so no
+    # ORM object or unit-of-work flush is needed for it
+    db.execute(insert(models.PostRevision).values(
+        post_id=post.id,
+        title_snapshot=post.title,
+        content_snapshot=post.content,
+        revision_author_id=current_user.id
+    ))
+    # assigned on the loaded object so it is current after commit; the flush
+    # picks up the new updated_at via RETURNING (eager_defaults)
+    post.title = post_in.title
+    post.content = post_in.content
+    post.content_hash = new_hash
+    post.slug = new_slug
+    db.commit()
+    clear_post_cache(id, author_id=current_user.id)
     return post
 
 @app.delete("/posts/{id}")
-def delete_post(id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
-    post = db.query(models.Post).filter(models.Post.id == id, models.Post.author_id == current_user.id).first()
-    if not post:
+def delete_post(id: int, db: Session = Depends(database.get_db), current_user: auth.UserPrincipal = Depends(get_current_user)):
+    owned = select(models.Post.id).where(models.Post.id == id, models.Post.author_id == current_user.id)
+    # revisions outlive the post (post_id NULL), as the ORM cascade used to leave them
+    db.execute(
+        update(models.PostRevision)
+        .where(models.PostRevision.post_id.in_(owned))
+        .values(post_id=None),
+        execution_options={"synchronize_session": False},
+    )
+    # ownership check and delete in one statement; no row is loaded
+    deleted = db.execute(
+        delete(models.Post)
+        .where(models.Post.id == id, models.Post.author_id == current_user.id)
+        .returning(models.Post.id),
+        execution_options={"synchronize_session": False},
+    ).first()
+    if deleted is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Post not found")
-    
-    db.delete(post)
     db.commit()
-    clear_post_cache(id)
+    clear_post_cache(id, author_id=current_user.id)
     return {"message": "Post deleted successfully"}
 
 @app.post("/posts/{id}/publish", response_model=schemas.PostResponse)
-def publish_post(id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
-    post = db.query(models.Post).filter(models.Post.id == id, models.Post.author_id == current_user.id).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-
-    # can only publish drafts or scheduled that are past due
-    if post.status == schemas.PostStatus.published:
+def publish_post(id: int, db: Session = Depends(database.get_db), current_user: auth.UserPrincipal = Depends(get_current_user)):
+    # can only publish drafts or scheduled that are past due; RETURNING hands
+    # back the updated row (DB-clock published_at included) in the same trip
+    post = db.execute(
+        update(models.Post)
+        .where(
+            models.Post.id == id,
+            models.Post.author_id == current_user.id,
+            models.Post.status != schemas.PostStatus.published,
+        )
+        .values(status=schemas.PostStatus.published, published_at=models.utcnow())
+        .returning(models.Post)
+    ).scalar_one_or_none()
+    if post is None:
+        # only the failure path pays for telling the two errors apart
+        owned = db.query(models.Post.id).filter(
+            models.Post.id == id, models.Post.author_id == current_user.id
+        ).first()
+        if not owned:
+            raise HTTPException(status_code=404, detail="Post not found")
         raise HTTPException(status_code=400, detail="Post is already published")
-
-    with db.begin():
-        post.status = schemas.PostStatus.published
-        post.published_at = datetime.utcnow()
-    db.refresh(post)
-    clear_post_cache(id)
+    db.commit()
+    clear_post_cache(id, author_id=current_user.id)
     return post
 
 @app.post("/posts/{id}/schedule", response_model=schemas.PostResponse)
-def schedule_post(id: int, sched: schemas.PostSchedule, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
-    post = db.query(models.Post).filter(models.Post.id == id, models.Post.author_id == current_user.id).first()
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-
+def schedule_post(id: int, sched: schemas.PostSchedule, db: Session = Depends(database.get_db), current_user: auth.UserPrincipal = Depends(get_current_user)):
     if sched.scheduled_for <= datetime.utcnow():
         raise HTTPException(status_code=400, detail="scheduled_for must be in the future")
 
-    with db.begin():
-        post.status = schemas.PostStatus.scheduled
-        post.scheduled_for = sched.scheduled_for
-    db.refresh(post)
-    clear_post_cache(id)
+    post = db.execute(
+        update(models.Post)
+        .where(models.Post.id == id, models.Post.author_id == current_user.id)
+        .values(status=schemas.PostStatus.scheduled, scheduled_for=sched.scheduled_for)
+        .returning(models.Post)
+    ).scalar_one_or_none()
+    if post is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    db.commit()
+    # wake the worker at the due time; rescheduling just moves the score
+    due_at = sched.scheduled_for.replace(tzinfo=timezone.utc).timestamp()
+    redis_client.zadd(SCHEDULED_POSTS_KEY, {id: due_at})
+    clear_post_cache(id, author_id=current_user.id)
     return post
 
+def save_upload(src, file_path: str) -> None:
+    # 1 MiB reads/writes instead of copyfileobj's small default buffer
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(src, buffer, UPLOAD_CHUNK_SIZE)
+
 @app.post("/media/upload")
-def upload_media(file: UploadFile = File(...), current_user: models.User = Depends(get_current_user)):
-    timestamp = int(datetime.utcnow().timestamp())
-    filename = f"{timestamp}_{file.filename}"
+async def upload_media(file: UploadFile = File(...), current_user: auth.UserPrincipal = Depends(get_current_user)):
+    # random prefix: no collisions between uploads within the same second;
+    # basename: a client-supplied path can't escape (or overwrite in) UPLOAD_DIR
+    filename = f"{secrets.token_hex(8)}_{os.path.basename(file.filename)}"
     file_path = os.path.join(UPLOAD_DIR, filename)
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # one threadpool hop for the whole copy rather than two per chunk
+    await run_in_threadpool(save_upload, file.file, file_path)
     
     return {
         "filename": file.filename,
@@ -297,22 +555,27 @@ def upload_media(file: UploadFile = File(...), current_user: models.User = Depen
     }
 
 @app.get("/posts/{id}/revisions", response_model=List[schemas.PostRevisionResponse])
-def get_revisions(id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(get_current_user)):
-    post = db.query(models.Post).filter(models.Post.id == id, models.Post.author_id == current_user.id).first()
-    if not post:
+def get_revisions(id: int, db: Session = Depends(database.get_db), current_user: auth.UserPrincipal = Depends(get_current_user)):
+    # ownership check only needs the id, not the whole row
+    owned = db.query(models.Post.id).filter(
+        models.Post.id == id, models.Post.author_id == current_user.id
+    ).first()
+    if not owned:
         raise HTTPException(status_code=404, detail="Post not found")
-        
-    revisions = db.query(models.PostRevision).filter(models.PostRevision.post_id == id).all()
+
+    # single LEFT JOIN instead of one user lookup per revision
+    revisions = db.query(models.PostRevision, models.User.username).outerjoin(
+        models.User, models.User.id == models.PostRevision.revision_author_id
+    ).filter(models.PostRevision.post_id == id).order_by(models.PostRevision.id).all()
     
     response = []
-    for r in revisions:
-        rev_user = db.query(models.User).filter(models.User.id == r.revision_author_id).first()
+    for r, username in revisions:
         response.append({
             "revision_id": r.id,
             "post_id": r.post_id,
             "title_snapshot": r.title_snapshot,
             "content_snapshot": r.content_snapshot,
-            "revision_author": rev_user.username if rev_user else "System",
-            "revision_timestamp": r.created_at
+            "revision_author": username or "System",
+            "revision_timestamp": r.revision_timestamp
         })
     return response
\ No newline at end of file
@@ -1,8 +1,11 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, func
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Index, LargeBinary, func, literal_column
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.dialects import postgresql  # registers to_tsvector/plainto_tsquery types
 import enum
 
-Base = declarative_base()
+from .database import Base
 
 # Defining the Enums as required
 class UserRole(str, enum.Enum):
@@ -14,6 +17,32 @@ class PostStatus(str, enum.Enum):
     scheduled = "scheduled"
     published = "published"
 
+# Full-text search (Postgres only). Literals rather than bound parameters, so
+# the query expression matches the ix_posts_search index expression exactly.
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+
+def search_vector(title, content):
+    return func.to_tsvector(
+        SEARCH_CONFIG,
+        func.coalesce(title, literal_column("''")) + literal_column("' '") + func.coalesce(content, literal_column("''")),
+    )
+
+# DB-clock "now" as naive UTC, matching scheduled_for (which the API validates
+# against datetime.utcnow()). Postgres now() follows the session TimeZone, so
+# convert explicitly.
+class utcnow(FunctionElement):
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utcnow, "postgresql")
+def _pg_utcnow(element, compiler, **kw):
+    return "timezone('UTC', now())"
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is already UTC
+    return "CURRENT_TIMESTAMP"
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -28,23 +57,39 @@ class Post(Base):
     title = Column(String)
     slug = Column(String, unique=True, index=True)
     content = Column(Text)
+    # blake2b-128 of content; lets update_post skip no-op edits
+    content_hash = Column(LargeBinary(16), nullable=True)
     status = Column(Enum(PostStatus), default=PostStatus.draft)
     author_id = Column(Integer, ForeignKey("users.id"))
     scheduled_for = Column(DateTime, nullable=True)
     published_at = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, onupdate=func.now())
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, onupdate=utcnow())
 
     # Relationship to history
     revisions = relationship("PostRevision", back_populates="post")
 
+    __table_args__ = (
+        # worker poll: status='scheduled' AND scheduled_for <= now()
+        Index("ix_posts_status_scheduled", "status", "scheduled_for"),
+        # public listing: status='published' ORDER BY published_at DESC
+        Index("ix_posts_status_published_at", "status", "published_at"),
+        # author listing; its author_id prefix also serves the FK lookups
+        Index("ix_posts_author_status", "author_id", "status"),
+        Index("ix_posts_search", search_vector(title, content), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+    # fetch created_at/updated_at/published_at via RETURNING in the flush
+    # itself instead of leaving them expired for a follow-up SELECT
+    __mapper_args__ = {"eager_defaults": True}
+
 class PostRevision(Base):
     __tablename__ = "post_revisions"
     id = Column(Integer, primary_key=True, index=True)
-    post_id = Column(Integer, ForeignKey("posts.id"))
+    post_id = Column(Integer, ForeignKey("posts.id"), index=True)
     title_snapshot = Column(String)
     content_snapshot = Column(Text)
     revision_author_id = Column(Integer, ForeignKey("users.id"))
-    revision_timestamp = Column(DateTime, server_default=func.now())
+    revision_timestamp = Column(DateTime, server_default=utcnow())
 
-    post = relationship("Post", back_populates="revisions")
\ No newline at end of file
+    post = relationship("Post", back_populates="revisions")
+    revision_author = relationship("User")
@@ -37,8 +37,10 @@ class PostCreate(PostBase):
 class PostSchedule(BaseModel):
     scheduled_for: datetime
 
-class PostResponse(PostBase):
+class PostSummary(BaseModel):
+    """Post metadata without the body, for list endpoints."""
     id: int
+    title: str
     slug: str
     status: PostStatus
     author_id: int
@@ -46,9 +48,12 @@ class PostResponse(PostBase):
     updated_at: Optional[datetime]
     published_at: Optional[datetime]
     scheduled_for: Optional[datetime]
-    
+
     model_config = ConfigDict(from_attributes=True)
 
+class PostResponse(PostSummary):
+    content: str
+
 class PostRevisionResponse(BaseModel):
     revision_id: int
     post_id: int
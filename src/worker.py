@@ -1,53 +1,84 @@
 import time
 import redis
 import json
-from datetime import datetime
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from . import models, schemas
-
-# Database Configuration (can be overridden via env)
 import os
-DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/cms_db")
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from sqlalchemy import update
+from . import models, schemas
+# Share the API's engine/pool configuration (DATABASE_URL env override included)
+from .database import SessionLocal
 
 # Redis Configuration for Cache Invalidation
 # This ensures that when a post is published by the worker, the public list updates immediately
 try:
-    redis_client = redis.Redis(host='cache', port=6379, db=0, decode_responses=True)
+    redis_client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://cache:6379/0"), decode_responses=True)
 except Exception as e:
     print(f"Worker: Redis connection failed (caching will not be invalidated): {e}")
     redis_client = None
 
-def clear_published_cache():
-    """Clears the public post list cache in Redis."""
+def clear_published_cache(post_ids=(), author_ids=()):
+    """Clears the public post list and search caches (and the given posts) in Redis."""
     if redis_client:
-        keys = redis_client.keys("published_list_*")
+        # the API records every cached list/search key in these sets;
+        # read and reset them atomically so concurrent registrations survive
+        with redis_client.pipeline() as pipe:
+            # bump the authors' list_posts ETag versions (see src.main)
+            for author_id in author_ids:
+                pipe.incr(f"author_posts_version_{author_id}")
+            pipe.sunion("published_list_keys", "search_cache_keys")
+            pipe.delete("published_list_keys", "search_cache_keys")
+            for post_id in post_ids:
+                pipe.delete(f"post_cache_{post_id}")
+            keys = pipe.execute()[len(author_ids)]
         if keys:
-            redis_client.delete(*keys)
+            redis_client.unlink(*keys)
             print(f"Worker: Invalidated {len(keys)} cache keys.", flush=True)
 
+SCHEDULED_POSTS_KEY = "scheduled_posts"
+
+def wait_for_due_post(timeout):
+    """Blocks until the earliest queued post is due, or `timeout` seconds pass.
+
+    The API adds each scheduled post to a Redis sorted set scored by its
+    publish time, so the worker sleeps instead of scanning the posts table
+    every tick. Returns True when a post is due and the DB should be swept.
+    """
+    entry = redis_client.bzpopmin(SCHEDULED_POSTS_KEY, timeout=timeout)
+    if entry is None:
+        return False
+    _, post_id, due_at = entry
+    delay = due_at - time.time()
+    if delay > 0:
+        # earliest entry isn't due yet: put it back (NX, so a reschedule the
+        # API wrote meanwhile keeps its newer score) and sleep until it is,
+        # bounded so a sooner post scheduled meanwhile isn't missed by much.
+        # The next BZPOPMIN pops it once due, so each post triggers one sweep.
+        redis_client.zadd(SCHEDULED_POSTS_KEY, {post_id: due_at}, nx=True)
+        time.sleep(min(delay, timeout))
+        return False
+    return True
+
 def publish_scheduled_posts():
     db = SessionLocal()
     try:
-        now = datetime.utcnow()
-        # Find posts that are scheduled and whose time has passed
-        posts = db.query(models.Post).filter(
-            models.Post.status == schemas.PostStatus.scheduled,
-            models.Post.scheduled_for <= now
+        # Publish every post whose scheduled time has passed (DB clock) in a
+        # single UPDATE ... RETURNING instead of loading and flushing each row
+        published = db.execute(
+            update(models.Post)
+            .where(
+                models.Post.status == schemas.PostStatus.scheduled,
+                models.Post.scheduled_for <= models.utcnow()
+            )
+            # published_at is the time it actually went live
+            .values(status=schemas.PostStatus.published, published_at=models.utcnow())
+            .returning(models.Post.id, models.Post.author_id)
         ).all()
+        db.commit()
 
-        if posts:
-            for post in posts:
-                print(f"Worker: Publishing post {post.id} - {post.title}", flush=True)
-                post.status = schemas.PostStatus.published
-                # Update published_at to the current time it actually went live
-                post.published_at = now
-            
-            db.commit()
+        if published:
+            published_ids = [post_id for post_id, _ in published]
+            print(f"Worker: Published posts {published_ids}", flush=True)
             # Clear the Redis cache so the public can see the new posts immediately
-            clear_published_cache()
+            clear_published_cache(published_ids, {author_id for _, author_id in published})
         
     except Exception as e:
         print(f"Worker Error: {e}", flush=True)
@@ -56,8 +87,26 @@ def publish_scheduled_posts():
         db.close()
 
 if __name__ == "__main__":
+    # Upper bound on a single wait; the DB is only swept when a queued post
+    # falls due, plus every WORKER_SWEEP_SECONDS to catch posts whose queue
+    # entry was lost (Redis restart, scheduled before the queue existed)
     interval = int(os.getenv("WORKER_INTERVAL_SECONDS", "30"))
-    print(f"Worker started: Monitoring scheduled posts every {interval} seconds...", flush=True)
+    sweep_every = int(os.getenv("WORKER_SWEEP_SECONDS", "600"))
+    print(f"Worker started: Waiting on '{SCHEDULED_POSTS_KEY}' (full sweep every {sweep_every} seconds)...", flush=True)
+    publish_scheduled_posts()
+    last_sweep = time.monotonic()
     while True:
-        publish_scheduled_posts()
-        time.sleep(interval)
\ No newline at end of file
+        due = False
+        if redis_client:
+            try:
+                due = wait_for_due_post(interval)
+            except redis.RedisError as e:
+                print(f"Worker: Redis wait failed, falling back to polling: {e}", flush=True)
+                time.sleep(interval)
+                due = True
+        else:
+            time.sleep(interval)
+            due = True
+        if due or time.monotonic() - last_sweep >= sweep_every:
+            publish_scheduled_posts()
+            last_sweep = time.monotonic()